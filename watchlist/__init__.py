@@ -0,0 +1,79 @@
+import os
+import sys
+
+from flask import Flask, render_template
+
+from watchlist.assets import init_assets
+from watchlist.blueprints.api import api_bp
+from watchlist.blueprints.auth import auth_bp
+from watchlist.blueprints.main import main_bp
+from watchlist.caching import init_caches, watchlist_owner
+from watchlist.commands import register_commands
+from watchlist.compression import init_compression
+from watchlist.database import configure_sqlite_engine, init_sqlite_engine
+from watchlist.extensions import db, login_manager
+from watchlist.metrics import init_metrics
+
+# 根据系统设置数据库文件的路径前缀
+WIN = sys.platform.startswith('win')
+if WIN:  # 如果是 Windows 系统，使用三个斜线
+    prefix = 'sqlite:///'
+else:  # 否则使用四个斜线
+    prefix = 'sqlite:////'
+
+
+def create_app(test_config=None):
+    """程序工厂：创建并配置程序实例
+
+    环境变量在调用时读取，test_config（一个字典）最后应用，可以覆盖任意配置，比如换成临时数据库。
+    这里只注册扩展、蓝本和命令，不连接数据库，所以可以在 fork 出 worker 之前预先加载（preload）。
+    """
+    app = Flask(__name__)
+    app.config.from_object('watchlist.settings')
+    # 数据库文件放在程序包的上一级目录（项目根目录），可以用环境变量 WATCHLIST_DATABASE_URI 指定其他数据库
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
+        'WATCHLIST_DATABASE_URI', prefix + os.path.join(os.path.dirname(app.root_path), 'data.db'))
+    app.config['SQLITE_PROFILE'] = os.getenv('WATCHLIST_DB_PROFILE', app.config['SQLITE_PROFILE'])
+    app.config['SQLITE_POOL_SIZE'] = int(os.getenv('WATCHLIST_DB_POOL_SIZE', app.config['SQLITE_POOL_SIZE']))
+    app.config['STATIC_BUILD_FOLDER'] = os.path.join(os.path.dirname(app.root_path), 'build', 'static')
+    app.config['SLOW_REQUEST_THRESHOLD'] = float(os.getenv('WATCHLIST_SLOW_REQUEST_SECONDS', '0')) or None
+    if test_config is not None:
+        app.config.update(test_config)
+
+    register_extensions(app)
+    register_blueprints(app)
+    register_errors(app)
+    register_template_context(app)
+    register_commands(app)
+    return app
+
+
+def register_extensions(app):
+    pragmas = configure_sqlite_engine(app)  # 引擎参数要在 db.init_app() 创建引擎之前设置好
+    db.init_app(app)
+    init_sqlite_engine(app, pragmas)
+    login_manager.init_app(app)
+    init_caches(app)
+    init_metrics(app)
+    init_compression(app)
+    init_assets(app)
+
+
+def register_blueprints(app):
+    app.register_blueprint(main_bp)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+
+def register_errors(app):
+    @app.errorhandler(404)
+    def page_not_found(e):
+        return render_template('404.html'), 404
+
+
+def register_template_context(app):
+    @app.context_processor
+    # 使用上下文处理器能将 user 作为全局变量传入所有模板。
+    def inject_user():
+        user = watchlist_owner()
+        return dict(user=user)
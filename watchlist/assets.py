@@ -0,0 +1,112 @@
+"""静态文件指纹：flask collect-static 生成带内容哈希的文件名，url_for('static', ...) 输出这些文件名
+
+文件名随内容变化，所以可以让浏览器永久缓存（immutable），重复访问页面时不再请求任何静态文件；
+文件内容一改，哈希跟着变，页面引用的就是新地址，不会用到旧的缓存。
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app, request, send_from_directory
+from werkzeug.exceptions import NotFound
+
+MANIFEST_NAME = 'manifest.json'
+# 这些类型的文本文件压缩效果好，额外生成 .gz 文件；png、gif 等图片本身已经压缩过，再压缩只会浪费 CPU
+PRECOMPRESS_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.ico', '.map'}
+# 一年，HTTP 规范建议的最长缓存时间
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def fingerprint_name(path, digest):
+    root, ext = os.path.splitext(path)
+    return f'{root}.{digest}{ext}'
+
+
+def collect_static(source, target, clean=False):
+    """把 source 目录下的静态文件复制到 target，文件名加上内容哈希，返回文件清单（原文件名 -> 带哈希的文件名）
+
+    旧版本的文件默认保留，已经打开的旧页面和共享缓存里的旧页面引用的还是它们；clean 为 True 时先清空 target。
+    """
+    if clean and os.path.isdir(target):
+        shutil.rmtree(target)
+    manifest = {}
+    for directory, _, files in os.walk(source):
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            filename = os.path.relpath(path, source).replace(os.sep, '/')  # url_for() 里用的是 / 分隔的路径
+            with open(path, 'rb') as f:
+                data = f.read()
+            hashed = fingerprint_name(filename, hashlib.sha1(data).hexdigest()[:12])
+            output = os.path.join(target, hashed)
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            with open(output, 'wb') as f:
+                f.write(data)
+            if os.path.splitext(name)[1].lower() in PRECOMPRESS_EXTENSIONS:
+                # mtime=0 让相同的内容每次生成完全相同的 .gz 文件；压缩后没有明显变小的就不保留
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) < len(data) * 0.9:
+                    with open(output + '.gz', 'wb') as f:
+                        f.write(compressed)
+            manifest[filename] = hashed
+    with open(os.path.join(target, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(target):
+    try:
+        with open(os.path.join(target, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:  # 还没有执行过 flask collect-static，使用原来的静态文件
+        return {}
+
+
+def fingerprint_static_url(endpoint, values):
+    """url_for('static', filename=...) 的默认值回调，把文件名换成清单里带哈希的文件名"""
+    if endpoint == 'static' and 'filename' in values:
+        manifest = current_app.extensions['static_manifest']
+        values['filename'] = manifest.get(values['filename'], values['filename'])
+
+
+def accepts_gzip():
+    return request.accept_encodings.quality('gzip') > 0
+
+
+def send_static_asset(filename):
+    """代替 Flask 默认的 static 视图：带哈希的文件从构建目录发送并设置永久缓存，其他文件照旧从 static 目录发送"""
+    if filename not in current_app.extensions['static_fingerprints']:
+        return current_app.send_static_file(filename)
+    folder = current_app.config['STATIC_BUILD_FOLDER']
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = None
+    if accepts_gzip():
+        try:
+            response = send_from_directory(folder, filename + '.gz', mimetype=mimetype)
+            response.headers['Content-Encoding'] = 'gzip'
+        except NotFound:  # 这个文件没有预压缩的版本
+            pass
+    if response is None:
+        response = send_from_directory(folder, filename, mimetype=mimetype)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_assets(app):
+    """读取 flask collect-static 生成的文件清单，没有清单时 url_for() 和 static 视图的行为不变
+
+    清单在程序实例创建时读取，重新执行 collect-static 之后需要重启程序（worker）才会使用新的文件名。
+    """
+    manifest = load_manifest(app.config['STATIC_BUILD_FOLDER']) if app.config['STATIC_FINGERPRINT'] else {}
+    app.extensions['static_manifest'] = manifest
+    # 页面里引用的静态文件地址随清单变化，清单的摘要算进页面缓存的键和 ETag，
+    # 重新 collect-static 之后浏览器不会继续使用引用旧文件名的页面
+    app.extensions['static_manifest_digest'] = hashlib.sha1(
+        json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest() if manifest else ''
+    app.extensions['static_fingerprints'] = frozenset(manifest.values())
+    if manifest:
+        app.url_defaults(fingerprint_static_url)
+        app.view_functions['static'] = send_static_asset
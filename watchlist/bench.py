@@ -0,0 +1,140 @@
+"""flask bench 和 flask bench-startup 用到的压测代码，只在执行这两个命令时才导入"""
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import event, select
+
+from watchlist.extensions import db
+from watchlist.models import Movie, User
+
+
+# 压测场景：每个场景接收一个测试客户端（需要登录的场景已经登录）和电影 ID 列表，发出一次请求
+BENCH_SCENARIOS = {
+    'index': (False, lambda client, ids: client.get('/')),
+    'index-auth': (True, lambda client, ids: client.get('/')),
+    'index-page': (False, lambda client, ids: client.get('/?sort=title&order=desc&per_page=100')),
+    'search': (False, lambda client, ids: client.get('/?q=' + random.choice(BENCH_WORDS))),
+    'edit': (True, lambda client, ids: client.get(f'/movie/edit/{random.choice(ids)}')),
+    # 每次都用新的客户端登录，避免 flash 消息在同一个会话里越积越多
+    'login': (False, lambda client, ids: client.application.test_client().post(
+        '/login', data={'username': 'bench', 'password': 'bench'})),
+    # 登录页只有一个表单，主要是 base.html 和 inject_user() 的开销
+    'inject-user': (False, lambda client, ids: client.get('/login')),
+}
+BENCH_WORDS = ['love', 'night', 'war', 'city', 'dream', 'star', 'dead', 'king', 'world', 'blue']
+
+
+def percentile(sorted_values, fraction):
+    """最近秩（nearest-rank）百分位数"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_bench_scenario(name, requests_count, threads, movie_ids):
+    """用 threads 个线程执行 requests_count 次请求，返回吞吐量、延迟分位数和每个请求的 SQL 查询数"""
+    needs_login, send = BENCH_SCENARIOS[name]
+    counter = threading.local()
+
+    def count_query(*args):
+        counter.queries = getattr(counter, 'queries', 0) + 1
+
+    app = current_app._get_current_object()
+
+    def worker(count):
+        client = app.test_client()
+        if needs_login:
+            client.post('/login', data={'username': 'bench', 'password': 'bench'}, follow_redirects=True)
+        samples = []
+        for i in range(count):
+            counter.queries = 0
+            start = time.perf_counter()
+            response = send(client, movie_ids)
+            samples.append((time.perf_counter() - start, counter.queries, response.status_code < 400))
+        return samples
+
+    per_thread = [requests_count // threads + (1 if i < requests_count % threads else 0) for i in range(threads)]
+    event.listen(db.engine, 'before_cursor_execute', count_query)
+    try:
+        worker(min(5, requests_count))  # 预热
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            samples = [sample for result in executor.map(worker, per_thread) for sample in result]
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_query)
+
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if not sample[2]),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+        },
+        'queries_per_request': round(sum(sample[1] for sample in samples) / len(samples), 2),
+    }
+
+
+def seed_bench_database(movies):
+    """在当前程序实例的（临时）数据库里建表，创建压测用户和 movies 部电影，返回全部电影 ID"""
+    db.create_all()
+    user = User(name='Bench', username='bench')
+    user.set_password('bench')
+    db.session.add(user)
+    db.session.flush()
+    rng = random.Random(42)
+    rows = ({'title': f'{rng.choice(BENCH_WORDS).title()} {rng.choice(BENCH_WORDS)} {i}',
+             'year': rng.randint(1920, 2024), 'user_id': user.id} for i in range(movies))
+    while True:
+        batch = [row for _, row in zip(range(5000), rows)]
+        if not batch:
+            break
+        db.session.execute(Movie.__table__.insert(), batch)
+    db.session.commit()
+    return db.session.execute(select(Movie.id)).scalars().all()
+
+
+# 在全新的解释器里计时：导入程序包、调用 create_app()，相当于 worker 启动和 flask 命令加载程序的开销
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import watchlist
+imported = time.perf_counter()
+watchlist.create_app()
+created = time.perf_counter()
+print(json.dumps([imported - start, created - imported]))
+"""
+
+
+def measure_startup(runs):
+    """在 runs 个新进程里测量启动耗时，返回各项耗时（毫秒）的中位数和最大值"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    samples = {'import_ms': [], 'create_app_ms': [], 'cli_ms': []}
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], env=env, cwd=root,
+                                check=True, capture_output=True, text=True).stdout
+        imported, created = json.loads(output)
+        samples['import_ms'].append(imported * 1000)
+        samples['create_app_ms'].append(created * 1000)
+        # 整个 flask 命令的耗时（包括解释器本身的启动），--help 会加载程序但不做别的事
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'watchlist', '--help'], env=env, cwd=root,
+                       check=True, capture_output=True)
+        samples['cli_ms'].append((time.perf_counter() - start) * 1000)
+    return {name: {'median': round(statistics.median(values), 1), 'max': round(max(values), 1)}
+            for name, values in samples.items()}
@@ -0,0 +1,182 @@
+import functools
+
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import current_user
+from sqlalchemy import bindparam, select, tuple_
+
+from watchlist.caching import bump_generation, owner_id
+from watchlist.extensions import db
+from watchlist.models import Movie, make_title_key, movie_upsert
+from watchlist.queries import clean_movie, query_movie_list
+
+api_bp = Blueprint('api', __name__)
+
+
+def api_login_required(view):
+    """API 版本的 login_required：未登录时返回 401 JSON，而不是重定向到登录页面"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify(error='Authentication required.'), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def movie_to_dict(movie):
+    return {'id': movie.id, 'title': movie.title, 'year': movie.year,
+            'imdb_id': movie.imdb_id, 'runtime': movie.runtime, 'genres': movie.genres}
+
+
+def is_json_int(value):
+    """JSON 中的 true/false 解析后是 bool，而 bool 是 int 的子类，要单独排除，否则 true 会被当成 ID 1"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def clean_movie_item(item):
+    """校验 API 请求中的一个电影对象，year 可以是数字或字符串"""
+    if not isinstance(item, dict):
+        return None
+    title, year = item.get('title'), item.get('year')
+    if is_json_int(year):
+        year = str(year)
+    if not isinstance(title, str) or not isinstance(year, str):
+        return None
+    return clean_movie(title, year)
+
+
+def apply_movie_batch(user_id, creates, updates, deletes, atomic=True):
+    """在一个事务里对 user_id 的清单执行一批创建、更新、删除操作，返回 (是否已提交, 每一条的结果)
+
+    先校验全部条目并用一次 IN 查询确认要更新、删除的记录存在且属于该用户；atomic 为真时只要有一条失败就什么都不做，
+    否则跳过失败的条目，其余照常执行。
+    """
+    results = {'create': [], 'update': [], 'delete': []}
+    rows_to_create, rows_to_update, ids_to_delete = [], [], []
+
+    for item in creates:
+        cleaned = clean_movie_item(item)
+        if cleaned is None:
+            results['create'].append({'status': 'error', 'error': 'Invalid input.'})
+        else:
+            rows_to_create.append((len(results['create']),
+                                   {'title': cleaned[0], 'year': cleaned[1], 'user_id': user_id}))
+            results['create'].append(None)
+
+    for item in updates:
+        cleaned = clean_movie_item(item)
+        movie_id = item.get('id') if isinstance(item, dict) else None
+        if cleaned is None or not is_json_int(movie_id):
+            results['update'].append({'status': 'error', 'error': 'Invalid input.'})
+        else:
+            rows_to_update.append((len(results['update']), {'b_id': movie_id, 'title': cleaned[0], 'year': cleaned[1],
+                                                             'title_key': make_title_key(cleaned[0])}))
+            results['update'].append(None)
+
+    for movie_id in deletes:
+        if not is_json_int(movie_id):
+            results['delete'].append({'status': 'error', 'error': 'Invalid input.'})
+        else:
+            ids_to_delete.append((len(results['delete']), movie_id))
+            results['delete'].append(None)
+
+    wanted = {row['b_id'] for _, row in rows_to_update} | {movie_id for _, movie_id in ids_to_delete}
+    existing = set()
+    if wanted:
+        stmt = select(Movie.id).where(Movie.user_id == user_id, Movie.id.in_(sorted(wanted)))
+        existing = set(db.session.execute(stmt).scalars())
+    for index, row in rows_to_update:
+        if row['b_id'] not in existing:
+            results['update'][index] = {'id': row['b_id'], 'status': 'error', 'error': 'Not found.'}
+    for index, movie_id in ids_to_delete:
+        if movie_id not in existing:
+            results['delete'][index] = {'id': movie_id, 'status': 'error', 'error': 'Not found.'}
+    rows_to_update = [(index, row) for index, row in rows_to_update if row['b_id'] in existing]
+    ids_to_delete = [(index, movie_id) for index, movie_id in ids_to_delete if movie_id in existing]
+
+    # 更新后与清单里另一部电影（或同一批里的其他条目）重复的，在执行前用一次唯一索引上的查询找出来
+    taken = {}
+    if rows_to_update:
+        keys = sorted({(row['title_key'], row['year']) for _, row in rows_to_update})
+        stmt = select(Movie.id, Movie.title_key, Movie.year).where(
+            Movie.user_id == user_id, tuple_(Movie.title_key, Movie.year).in_(keys))
+        taken = {(title_key, year): movie_id for movie_id, title_key, year in db.session.execute(stmt)}
+        for _, row in rows_to_create:  # 同一批里新建的电影还没有 ID
+            taken.setdefault((make_title_key(row['title']), row['year']), None)
+    for index, row in rows_to_update:
+        key = (row['title_key'], row['year'])
+        if taken.setdefault(key, row['b_id']) != row['b_id']:
+            results['update'][index] = {'id': row['b_id'], 'status': 'error', 'error': 'Duplicate movie.'}
+    rows_to_update = [(index, row) for index, row in rows_to_update if results['update'][index] is None]
+
+    failed = any(result is not None for group in results.values() for result in group)
+    if failed and atomic:
+        for group in results.values():
+            for index, result in enumerate(group):
+                if result is None:
+                    group[index] = {'status': 'skipped'}
+        return False, results
+
+    movies = Movie.__table__
+    for index, row in rows_to_create:  # SQLite 的 executemany 拿不到自增 ID，逐条执行，但仍在同一个事务里
+        result = db.session.execute(movie_upsert, row)
+        if result.rowcount:
+            results['create'][index] = {'id': result.inserted_primary_key[0], 'status': 'created'}
+        else:  # 清单里已经有这部电影，返回已有记录的 ID
+            movie_id = db.session.execute(select(Movie.id).where(
+                Movie.user_id == user_id, Movie.title_key == make_title_key(row['title']),
+                Movie.year == row['year'])).scalar()
+            results['create'][index] = {'id': movie_id, 'status': 'exists'}
+    if rows_to_update:
+        update_stmt = movies.update().where(movies.c.id == bindparam('b_id'), movies.c.user_id == user_id).values(
+            title=bindparam('title'), year=bindparam('year'), title_key=bindparam('title_key'))
+        db.session.execute(update_stmt, [row for _, row in rows_to_update])
+        for index, row in rows_to_update:
+            results['update'][index] = {'id': row['b_id'], 'status': 'updated'}
+    if ids_to_delete:
+        db.session.execute(movies.delete().where(
+            movies.c.user_id == user_id, movies.c.id.in_([movie_id for _, movie_id in ids_to_delete])))
+        for index, movie_id in ids_to_delete:
+            results['delete'][index] = {'id': movie_id, 'status': 'deleted'}
+    if rows_to_create or rows_to_update or ids_to_delete:
+        bump_generation(user_id)
+    db.session.commit()
+    return True, results
+
+
+@api_bp.route('/movies')
+def api_movies():
+    """电影列表 API，查询参数和主页相同，用 next/prev 游标翻页"""
+    listing = query_movie_list()
+    page = listing['page']
+    return jsonify(items=[movie_to_dict(movie) for movie in page.items],
+                   next=page.next_cursor, prev=page.prev_cursor)
+
+
+@api_bp.route('/movies/<int:movie_id>')
+def api_movie(movie_id):
+    """单个电影 API"""
+    movie = Movie.query.filter_by(id=movie_id, user_id=owner_id()).first()
+    if movie is None:
+        return jsonify(error='Not found.'), 404
+    return jsonify(movie_to_dict(movie))
+
+
+@api_bp.route('/movies/batch', methods=['POST'])
+@api_login_required
+def api_movie_batch():
+    """批量修改 API
+
+    请求体：{"create": [{"title", "year"}], "update": [{"id", "title", "year"}], "delete": [id], "atomic": true}
+    所有操作在一个事务里完成，响应中按请求的顺序返回每一条的结果；清单里已经有的电影不会重复创建，状态为 exists。
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify(error='Expected a JSON object.'), 400
+    creates, updates, deletes = data.get('create', []), data.get('update', []), data.get('delete', [])
+    if not all(isinstance(group, list) for group in (creates, updates, deletes)):
+        return jsonify(error='create, update and delete must be arrays.'), 400
+    if len(creates) + len(updates) + len(deletes) > current_app.config['API_MAX_BATCH_SIZE']:
+        return jsonify(error='Too many operations in one batch.'), 413
+    committed, results = apply_movie_batch(current_user.id, creates, updates, deletes,
+                                           atomic=data.get('atomic', True) is not False)
+    return jsonify(committed=committed, results=results), 200 if committed else 422
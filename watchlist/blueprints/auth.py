@@ -0,0 +1,66 @@
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask_login import current_user, login_required, login_user, logout_user
+
+from watchlist.caching import bump_generation, user_cache
+from watchlist.extensions import db
+from watchlist.models import User
+
+auth_bp = Blueprint('auth', __name__)
+
+
+@auth_bp.route('/login', methods=['GET', 'POST'])
+def login():
+    """用户登录视图函数"""
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+
+        if not username or not password:
+            flash('Invalid input.')
+            return redirect(url_for('.login'))
+
+        user = User.query.filter_by(username=username).first()  # 通过 username 上的唯一索引查找
+        # 验证用户名和密码是否一致
+        if user is not None and user.validate_password(password):
+            login_user(user)  # 使用 Flask_Login 的 login_user 函数实现用户登录
+            flash('Login success.')
+            return redirect(url_for('main.index'))  # 重定向到主页
+
+        flash('Invalid username or password.')  # 如果验证失败，显示错误消息
+        return redirect(url_for('.login'))  # 重定向回登录页面
+
+    return render_template('login.html')
+
+
+@auth_bp.route('/logout')
+@login_required  # 用于视图保护，后面会详细介绍
+def logout():
+    """用户登出视图函数"""
+    logout_user()  # 使用 Flask_Login 的 logout_user 函数实现用户登出
+    flash('Goodbye.')
+    return redirect(url_for('main.index'))  # 重定向回首页
+
+
+@auth_bp.route('/settings', methods=['GET', 'POST'])
+@login_required
+def settings():
+    """用户设置视图"""
+    if request.method == 'POST':
+        name = request.form['name']
+
+        if not name or len(name) > 20:
+            flash('Invalid input.')
+            return redirect(url_for('.settings'))
+
+        current_user.name = name    # 更新用户名
+        # current_user 会返回当前登录用户的数据库记录对象
+        # 等同于下面的用法
+        # user = User.query.first()
+        # user.name = name
+        bump_generation(current_user.id)  # 页面标题里显示了名字
+        db.session.commit()
+        user_cache.clear()  # 名字变了，清空用户缓存
+        flash('Settings updated.')
+        return redirect(url_for('main.index'))
+
+    return render_template('settings.html')
@@ -0,0 +1,143 @@
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, stream_with_context, \
+    url_for
+from flask_login import current_user, login_required
+from sqlalchemy.exc import IntegrityError
+
+from watchlist.caching import bump_generation, cached_response, owner_id
+from watchlist.extensions import db
+from watchlist.metrics import request_metrics
+from watchlist.models import Movie, movie_upsert
+from watchlist.queries import EXPORT_FORMATS, clean_movie, decade_facets, iter_export, movie_total, \
+    query_movie_list, year_counts
+
+main_bp = Blueprint('main', __name__)
+
+
+@main_bp.route('/', methods=['GET', 'POST'])    # 让视图函数支持 GET 和 POST 请求。
+def index():
+    """主页视图函数"""
+    # 对于 POST 请求，则获取提交的表单数据并保存。
+    if request.method == 'POST':  # 判断是否是 POST 请求
+        """ request 是 Flask 提供的一个全局对象，它封装了客户端发出的 HTTP 请求中的内容：
+        请求的路径（request.path）
+        请求的方法（request.method）
+        表单数据（request.form）
+        查询字符串（request.args）
+        远程地址（request.remote_addr）
+        请求头（request.headers）
+        文件数据（request.files）
+        """
+        if not current_user.is_authenticated:  # 使用 Flask-Login 提供的 current_user 变量，判断用户是否登录
+            return redirect(url_for('.index'))  # 重定向到主页
+        # 获取表单数据
+        title = request.form.get('title')  # 传入表单对应输入字段的 name 值
+        year = request.form.get('year')
+        # 验证数据
+        cleaned = clean_movie(title, year)
+        if cleaned is None:
+            """
+            在真实工作里会进行更严苛的验证，比如对数据去除首尾的空格。
+            一般情况下，我们会使用第三方库（比如 WTForms）来实现表单数据的验证工作。
+            """
+            flash('Invalid input.')  # 显示错误提示
+            """ flash() 函数用来在视图函数里向模板传递提示消息
+            该函数会把消息存储到 Flask 提供的 session 对象里，session 对象会把数据存储到浏览器的 cookie 里，记得要设置签名密钥。
+            可以在模板中使用 get_flashed_messages() 函数获取到所有的提示消息。
+            """
+            return redirect(url_for('.index'))  # 重定向回主页
+        title, year = cleaned
+        # 保存表单数据到数据库，记录属于当前用户；清单里已经有这部电影时什么都不做
+        if not db.session.execute(movie_upsert, {'title': title, 'year': year, 'user_id': current_user.id}).rowcount:
+            flash('Item already exists.')
+            return redirect(url_for('.index'))
+        bump_generation(current_user.id)  # 电影列表变了，让页面缓存失效
+        db.session.commit()  # 提交数据库会话
+        flash('Item created.')  # 显示成功创建的提示
+        return redirect(url_for('.index'))  # 重定向回主页
+    # 对于 GET 请求，返回渲染后的页面；
+    return cached_response(render_movie_list)
+
+
+def render_movie_list():
+    """渲染电影列表页"""
+    listing = query_movie_list()
+    user_id = owner_id()
+    movie_count = movie_total(user_id)  # 从统计汇总表读取，不再 len(movies)
+    return render_template('index.html', movies=listing['page'].items, movie_count=movie_count,
+                           decades=decade_facets(user_id), **listing)
+
+
+@main_bp.route('/stats')
+def stats():
+    """统计视图函数：总数、每个年代和每一年的电影数量"""
+    return cached_response(render_stats)
+
+
+def render_stats():
+    user_id = owner_id()
+    return render_template('stats.html', movie_count=movie_total(user_id),
+                           decades=decade_facets(user_id), years=year_counts(user_id))
+
+
+@main_bp.route('/movie/edit/<int:movie_id>', methods=['GET', 'POST'])
+@login_required
+def edit(movie_id):
+    """条目编辑视图函数"""
+    movie = Movie.query.filter_by(id=movie_id, user_id=current_user.id).first_or_404()  # 只能操作自己的电影
+
+    if request.method == 'POST':  # 处理编辑表单的提交请求
+        title = request.form['title']
+        year = request.form['year']
+
+        cleaned = clean_movie(title, year)
+        if cleaned is None:
+            flash('Invalid input.')
+            return redirect(url_for('.edit', movie_id=movie_id))  # 重定向回对应的编辑页面
+        title, year = cleaned
+
+        movie.title = title  # 更新标题
+        movie.year = year  # 更新年份
+        try:
+            bump_generation(current_user.id)  # 执行前会先 flush，和清单里另一部电影重复时在这里违反唯一索引
+            db.session.commit()  # 提交数据库会话
+        except IntegrityError:
+            db.session.rollback()
+            flash('Item already exists.')
+            return redirect(url_for('.edit', movie_id=movie_id))
+        flash('Item updated.')
+        return redirect(url_for('.index'))  # 重定向回主页
+
+    return render_template('edit.html', movie=movie)  # 传入被编辑的电影记录
+
+
+@main_bp.route('/movie/delete/<int:movie_id>', methods=['POST'])
+@login_required  # 仅登录可访问。如果未登录的用户访问对应的 URL，Flask-Login 会把用户重定向到 login_manager.login_view 指定的登录页面。
+def delete(movie_id):
+    """条目删除视图函数"""
+    movie = Movie.query.filter_by(id=movie_id, user_id=current_user.id).first_or_404()  # 只能操作自己的电影
+    db.session.delete(movie)
+    bump_generation(current_user.id)
+    db.session.commit()
+    flash('Item deleted.')
+    return redirect(url_for('.index'))
+
+
+@main_bp.route('/export')
+@login_required
+def export():
+    """导出视图函数，以流式响应返回全部电影，客户端可以边下载边处理"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    response = current_app.response_class(stream_with_context(iter_export(fmt, current_user.id)),
+                                          mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=watchlist.{fmt}'
+    return response
+
+
+@main_bp.route('/metrics')
+def metrics():
+    """监控指标视图函数，供 Prometheus 抓取"""
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404)
+    return current_app.response_class(request_metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,60 @@
+"""命令行批量导入和数据补充用到的文件解析，只在执行对应的命令时才导入"""
+import csv
+import gzip
+import json
+
+import click
+
+
+def iter_movie_rows(source, fmt):
+    """逐行读取导入文件，生成 (行号, title, year)，不会把整个文件读进内存"""
+    if fmt == 'csv':
+        reader = csv.DictReader(source)
+        for row in reader:
+            yield reader.line_num, row.get('title'), row.get('year')
+    else:
+        for line_no, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_no, None, None  # 交给校验环节当作非法行处理
+                continue
+            if not isinstance(row, dict):
+                yield line_no, None, None
+                continue
+            title, year = row.get('title'), row.get('year')
+            if not isinstance(title, str):  # 比如 {"title": 5}，标题不是字符串的当作非法行
+                title = None
+            yield line_no, title, str(year) if year is not None else None
+
+
+# IMDb 数据文件中参与匹配的条目类型，剧集（tvEpisode 等）经常和电影同名同年，不参与匹配
+ENRICH_TITLE_TYPES = {'movie', 'tvMovie', 'video'}
+
+
+def iter_imdb_titles(path):
+    """逐行读取 IMDb 的 title.basics.tsv（或 .tsv.gz），生成 (tconst, titles, year, runtime, genres)
+
+    文件有好几个 GB，不能读进内存；格式是没有引号转义的 TSV，\\N 表示空值，直接按制表符切分比 csv 模块快得多。
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='\n') as lines:
+        header = next(lines, '').rstrip('\n').split('\t')
+        columns = {name: index for index, name in enumerate(header)}
+        try:
+            indexes = [columns[name] for name in ('tconst', 'titleType', 'primaryTitle', 'originalTitle',
+                                                  'startYear', 'runtimeMinutes', 'genres')]
+        except KeyError:
+            raise click.ClickException(f'{path} is not a title.basics.tsv file.')
+        for line in lines:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) != len(header):
+                continue
+            tconst, title_type, primary, original, year, runtime, genres = (fields[index] for index in indexes)
+            if title_type not in ENRICH_TITLE_TYPES or not year.isdigit():
+                continue
+            titles = (primary,) if original == primary else (primary, original)
+            yield (tconst, titles, int(year), int(runtime) if runtime.isdigit() else None,
+                   None if genres == '\\N' else genres)
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from werkzeug.local import LocalProxy
+
+from watchlist.compression import GZIP_ETAG_SUFFIX
+from watchlist.extensions import db
+from watchlist.models import CacheGeneration, User
+
+
+class UserCache:
+    """进程内的用户缓存
+
+    每次渲染模板都会调用 inject_user()，每个登录用户的请求都会调用 load_user()，
+    而用户信息几乎不会变化，所以把查询结果缓存起来，省掉每个请求里的一两次数据库查询。
+    缓存里保存的是从会话中分离（detached）的对象，取出时用 merge(load=False) 放回当前请求的会话，
+    这一步不会发出 SQL，并且取出的对象仍然可以修改后提交。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (user, 过期时间)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, loader):
+        """读取缓存，未命中时调用 loader() 从数据库加载"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return db.session.merge(entry[0], load=False)
+            self.misses += 1
+        user = loader()
+        if user is None:  # 没有用户时不缓存，等创建用户后再加载
+            return None
+        db.session.expunge(user)
+        with self._lock:
+            self._entries[key] = (user, now + current_app.config['USER_CACHE_TTL'])
+        return db.session.merge(user, load=False)
+
+    def clear(self):
+        """用户信息被修改后调用，清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+# 缓存属于程序实例（create_app() 里创建），同一个进程里的多个程序实例（比如连接不同数据库的）互不干扰
+user_cache = LocalProxy(lambda: current_app.extensions['user_cache'])
+
+
+def watchlist_owner():
+    """当前显示的是谁的观影清单：登录后是自己的，未登录时是第一个用户的（与单用户时的行为一致）"""
+    if current_user.is_authenticated:
+        return current_user._get_current_object()
+    return user_cache.get('owner', lambda: User.query.order_by(User.id).first())
+
+
+def owner_id():
+    owner = watchlist_owner()
+    return owner.id if owner is not None else None
+
+
+def bump_generation(user_id):
+    """把某个用户的清单的版本号加一，需要和数据修改一起提交"""
+    stmt = sqlite_insert(CacheGeneration).values(name=f'movies:{user_id}', value=1)
+    stmt = stmt.on_conflict_do_update(index_elements=['name'], set_={'value': CacheGeneration.value + 1})
+    db.session.execute(stmt)
+
+
+def current_generation(user_id):
+    return db.session.query(CacheGeneration.value).filter_by(name=f'movies:{user_id}').scalar() or 0
+
+
+class PageCache:
+    """进程内的整页缓存，按 LRU 淘汰
+
+    缓存键里包含数据版本号，数据修改后旧的条目不会再被命中，随后被自然淘汰。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > current_app.config['PAGE_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+page_cache = LocalProxy(lambda: current_app.extensions['page_cache'])
+
+
+def init_caches(app):
+    app.extensions['user_cache'] = UserCache()
+    app.extensions['page_cache'] = PageCache()
+
+
+TEMPLATE_FOLDER = os.path.join(os.path.dirname(__file__), 'templates')
+# 模板文件的修改时间也算进 ETag，重新部署改了模板之后，浏览器里旧的缓存不会再被当成有效
+TEMPLATE_STAMP = max(
+    (os.path.getmtime(os.path.join(TEMPLATE_FOLDER, name)) for name in os.listdir(TEMPLATE_FOLDER)),
+    default=0,
+)
+
+
+def cached_response(render):
+    """缓存 render() 渲染出的整页内容，并用强 ETag 响应条件请求（If-None-Match）
+
+    匿名用户和登录用户看到的页面不同，每个用户的清单也不同，分开缓存；有待显示的 flash 消息时不使用缓存。
+    """
+    if not current_app.config['PAGE_CACHE_ENABLED'] or session.get('_flashes'):
+        return render()
+    variant = 'auth' if current_user.is_authenticated else 'anon'
+    user_id = owner_id()
+    key = (request.endpoint, variant, user_id, current_generation(user_id),
+           current_app.extensions['static_manifest_digest'],
+           tuple(sorted(request.args.items(multi=True))))
+    etag = hashlib.sha1(repr((TEMPLATE_STAMP, key)).encode('utf-8')).hexdigest()
+
+    # 浏览器或代理手里的版本（压缩过的版本 ETag 带 -gzip 后缀）仍然有效，不用查询也不用渲染
+    if request.if_none_match.contains(etag) or request.if_none_match.contains(etag + GZIP_ETAG_SUFFIX):
+        response = current_app.response_class(status=304)
+    else:
+        body = page_cache.get(key)
+        if body is None:
+            body = render()
+            page_cache.set(key, body)
+        response = make_response(body)
+    response.set_etag(etag)
+    # no-cache 表示每次使用前都要带着 ETag 回来验证；登录用户的页面不能被共享缓存保存
+    response.headers['Cache-Control'] = 'private, no-cache' if variant == 'auth' else 'no-cache'
+    response.vary.add('Cookie')
+    return response
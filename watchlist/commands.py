@@ -0,0 +1,351 @@
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, select
+from sqlalchemy.exc import IntegrityError
+
+from watchlist.assets import collect_static
+from watchlist.caching import bump_generation, user_cache
+from watchlist.extensions import db
+from watchlist.models import Movie, MovieYearStat, User, make_title_key, movie_upsert, rebuild_stats
+from watchlist.queries import clean_movie, iter_export
+
+# 命令在程序实例创建时注册，但命令用到的较重的模块（批量导入和 IMDb 数据解析、数据库升级、压测）在命令执行时才导入，
+# worker 启动和与之无关的 flask 命令都不需要为它们付出导入的开销。
+
+
+# 7，一般会创建一个来自动执行创建数据库表操作的自定义命令：
+@click.command()  # 注册为命令，可以传入 name 参数来自定义命令，否则函数名称就是命令的名字
+@click.option('--drop', is_flag=True, help='Create after drop.')  # 设置选项
+@with_appcontext
+def initdb(drop):
+    """Initialize the database, or upgrade an existing one."""
+    from watchlist.upgrade import upgrade_database
+
+    if drop:  # 判断是否输入了选项
+        db.drop_all()
+    db.create_all()
+    try:
+        upgrade_database()
+    except IntegrityError:
+        raise click.ClickException('Duplicate usernames found, rename them before upgrading.')
+    click.echo('Initialized database.')  # 输出提示信息
+# 然后在命令行中执行 flask initdb 命令，就会自动创建数据库表了。
+# 如果想要删除表后重新创建，可以执行 flask initdb --drop 命令。
+# 对已有的 data.db 执行 flask initdb 会在保留数据的前提下把它升级到当前的表结构，重复的电影只保留最早添加的一条。
+
+
+@click.command('rebuild-stats')
+@with_appcontext
+def rebuild_stats_command():
+    """Recompute the per-year statistics from the movie table."""
+    # 重新计算前后出现过的用户都要让页面缓存失效，版本号和汇总表在同一个事务里提交
+    stat_users = select(MovieYearStat.user_id).distinct()
+    user_ids = set(db.session.execute(stat_users).scalars())
+    rebuild_stats(db.session.connection())
+    user_ids.update(db.session.execute(stat_users).scalars())
+    for user_id in user_ids:
+        bump_generation(user_id)
+    db.session.commit()
+    click.echo('Statistics rebuilt.')
+# 统计汇总表由触发器维护，一般不需要手动执行；直接修改过数据库文件后可以用它重新计算：
+# (venv) $ flask rebuild-stats
+
+
+@click.command()
+@with_appcontext
+def dedupe():
+    """Remove duplicate movies, keeping the oldest of each, and enforce uniqueness."""
+    from watchlist.upgrade import remove_duplicate_movies
+
+    removed = remove_duplicate_movies()
+    db.session.commit()
+    for index in Movie.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    click.echo(f'Removed {removed} duplicate movies.')
+# flask initdb 升级时已经会删除重复的电影；直接修改过数据库文件（比如删掉了唯一索引）之后可以用它清理并重建索引：
+# (venv) $ flask dedupe
+
+
+# 向数据库插入测试数据。
+@click.command()
+@with_appcontext
+def forge():
+    # 先创建所有表
+    db.create_all()
+    # 准备测试数据
+    name = 'xiaolu2333'
+    movies = [
+        {'title': 'My Neighbor Totoro', 'year': 1988},
+        {'title': 'Dead Poets Society', 'year': 1989},
+        {'title': 'A Perfect World', 'year': 1993},
+        {'title': 'Leon', 'year': 1994},
+        {'title': 'Mahjong', 'year': 1996},
+        {'title': 'Swallowtail Butterfly', 'year': 1996},
+        {'title': 'King of Comedy', 'year': 1999},
+        {'title': 'Devils on the Doorstep', 'year': 1999},
+        {'title': 'WALL-E', 'year': 2008},
+        {'title': 'The Pork of Music', 'year': 2012},
+    ]
+    # 添加测试数据，重复执行时沿用已有的用户，已经存在的电影被跳过
+    user = User.query.order_by(User.id).first()
+    if user is None:
+        user = User(name=name)
+        db.session.add(user)
+        db.session.flush()  # 先写入用户，拿到 user.id
+    db.session.execute(movie_upsert, [dict(m, user_id=user.id) for m in movies])
+    bump_generation(user.id)
+    # 提交会话
+    db.session.commit()
+    # 提示成功
+    click.echo('Done.')
+# 通过 flask forge 命令向数据库插入测试数据：
+# (venv) dfl@WebDev:~/learn/flask/watchlist$ flask forge
+# Done.
+
+
+@click.command()
+@click.option('--username', prompt=True, help='The username used to login.')
+@click.option('--password', prompt=True, hide_input=True, confirmation_prompt=True, help='The password used to login.')
+@with_appcontext
+def admin(username, password):
+    """Create user."""
+    db.create_all()
+
+    # 按用户名查找；flask forge 创建的用户还没有用户名，由第一次执行 admin 命令认领
+    user = User.query.filter_by(username=username).first() or User.query.filter_by(username=None).first()
+    if user is not None:
+        click.echo('Updating user...')
+        user.username = username
+        user.set_password(password)  # 设置密码
+    else:
+        click.echo('Creating user...')
+        user = User(username=username, name='Admin')
+        user.set_password(password)  # 设置密码
+        db.session.add(user)
+        db.session.flush()
+        # 在还没有任何用户时升级的数据库里，原有的电影没有所属用户，交给第一个创建的用户
+        Movie.query.filter_by(user_id=None).update({'user_id': user.id})
+
+    bump_generation(user.id)
+    db.session.commit()  # 提交数据库会话
+    user_cache.clear()
+    click.echo('Done.')
+# 通过 flask admin 命令创建管理员账户：xiaolu，密码：123456
+# 每个用户都有自己的观影清单，用不同的用户名执行 flask admin 就能创建多个用户。
+# 更多的用户管理功能通常使用 Flask-Login：https://flask-login.readthedocs.io/en/latest/
+
+
+def find_cli_user(username):
+    """命令行里按 --username 查找用户，没有指定时使用第一个用户（单用户部署）"""
+    if username:
+        user = User.query.filter_by(username=username).first()
+    else:
+        user = User.query.order_by(User.id).first()
+    if user is None:
+        raise click.ClickException('User not found, create one with flask admin first.')
+    return user
+
+
+@click.command('import-movies')
+@click.argument('source', type=click.File('r', encoding='utf-8'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Input format. Guessed from the file extension by default.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows inserted per transaction.')
+@click.option('--username', help='Owner of the imported movies. Defaults to the first user.')
+@with_appcontext
+def import_movies(source, fmt, batch_size, username):
+    """Import movies from a CSV or JSONL file, or from stdin."""
+    from watchlist.bulk import iter_movie_rows
+
+    user_id = find_cli_user(username).id
+    if fmt is None:
+        fmt = 'jsonl' if source.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+    # 绕过 ORM，用 Core 的 INSERT 配合 executemany 批量插入，每一批一个事务；已经存在的电影由 upsert 跳过
+    batch = []
+    imported = skipped = duplicates = 0
+    start = time.perf_counter()
+
+    def flush():
+        nonlocal imported, duplicates
+        inserted = db.session.execute(movie_upsert, batch).rowcount
+        imported += inserted
+        duplicates += len(batch) - inserted
+        bump_generation(user_id)
+        db.session.commit()
+        batch.clear()
+
+    for line_no, title, year in iter_movie_rows(source, fmt):
+        cleaned = clean_movie(title, year)
+        if cleaned is None:
+            skipped += 1
+            click.echo(f'Line {line_no}: invalid row skipped.', err=True)
+            continue
+        batch.append({'title': cleaned[0], 'year': cleaned[1], 'user_id': user_id})
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    elapsed = time.perf_counter() - start
+    rate = (imported + duplicates) / elapsed if elapsed else 0
+    click.echo(f'Imported {imported} movies, skipped {skipped} invalid and {duplicates} duplicate rows, '
+               f'in {elapsed:.2f}s ({rate:.0f} rows/sec).')
+# 从文件或标准输入导入，CSV 需要包含 title 和 year 两列，JSONL 每行一个 {"title": ..., "year": ...} 对象：
+# (venv) $ flask import-movies movies.csv --batch-size 5000
+# (venv) $ cat movies.jsonl | flask import-movies --format jsonl
+
+
+@click.command('export-movies')
+@click.argument('output', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True,
+              help='Output format.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows fetched from the database at a time.')
+@click.option('--username', help='Whose watchlist to export. Defaults to the first user.')
+@with_appcontext
+def export_movies(output, fmt, chunk_size, username):
+    """Export a watchlist as CSV or JSONL to a file, or to stdout."""
+    for chunk in iter_export(fmt, find_cli_user(username).id, chunk_size):
+        output.write(chunk)
+# (venv) $ flask export-movies --format jsonl > movies.jsonl
+
+
+@click.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, show_default=True, help='Matched movies written per transaction.')
+@click.option('--all', 'refresh', is_flag=True, help='Also refresh movies that already have an IMDb ID.')
+@with_appcontext
+def enrich(path, batch_size, refresh):
+    """Fill in IMDb IDs, runtimes and genres from a local title.basics.tsv(.gz) dump."""
+    from watchlist.bulk import iter_imdb_titles
+
+    # 先把我们自己的电影按 (规范化标题, 年份) 建一个哈希索引，然后顺序扫描一遍数据文件，每一行查一次字典。
+    # 内存占用取决于电影清单的大小，与数据文件的大小无关；匹配过的键从索引中删除，一部电影只取第一条匹配。
+    stmt = select(Movie.id, Movie.user_id, Movie.title_key, Movie.year).where(Movie.user_id.isnot(None))
+    if not refresh:
+        stmt = stmt.where(Movie.imdb_id.is_(None))
+    wanted = defaultdict(list)
+    for movie_id, user_id, title_key, year in db.session.execute(stmt):
+        wanted[title_key, year].append((movie_id, user_id))
+    years = {year for _, year in wanted}  # 先按年份过滤，大部分行不用规范化标题
+    if not wanted:
+        click.echo('Nothing to enrich.')
+        return
+
+    movies = Movie.__table__
+    update_stmt = movies.update().where(movies.c.id == bindparam('b_id')).values(
+        imdb_id=bindparam('imdb_id'), runtime=bindparam('runtime'), genres=bindparam('genres'))
+    batch, user_ids = [], set()
+    scanned = matched = 0
+    start = time.perf_counter()
+
+    def flush():
+        db.session.execute(update_stmt, batch)
+        for user_id in user_ids:
+            bump_generation(user_id)
+        db.session.commit()
+        batch.clear()
+        user_ids.clear()
+
+    for tconst, titles, year, runtime, genres in iter_imdb_titles(path):
+        scanned += 1
+        if year not in years:
+            continue
+        for title in titles:
+            found = wanted.pop((make_title_key(title), year), None)
+            if found is None:
+                continue
+            for movie_id, user_id in found:
+                batch.append({'b_id': movie_id, 'imdb_id': tconst, 'runtime': runtime, 'genres': genres})
+                user_ids.add(user_id)
+                matched += 1
+            if len(batch) >= batch_size:
+                flush()
+            break
+        if not wanted:  # 全部匹配完了，不必读完整个文件
+            break
+    if batch:
+        flush()
+
+    elapsed = time.perf_counter() - start
+    rate = scanned / elapsed if elapsed else 0
+    click.echo(f'Matched {matched} movies against {scanned} titles in {elapsed:.2f}s ({rate:.0f} titles/sec).')
+# IMDb 官方提供的数据文件（https://datasets.imdbws.com/）下载到本地后执行，不会访问任何在线服务：
+# (venv) $ flask enrich title.basics.tsv.gz
+
+
+@click.command('collect-static')
+@click.option('--clean', is_flag=True, help='Remove previously collected files first.')
+@with_appcontext
+def collect_static_command(clean):
+    """Copy static files under content-hashed names and write the manifest."""
+    target = current_app.config['STATIC_BUILD_FOLDER']
+    manifest = collect_static(current_app.static_folder, target, clean)
+    click.echo(f'Collected {len(manifest)} static files into {target}.')
+# 部署时执行一次，然后重启程序；修改了 static 目录下的文件之后需要重新执行：
+# (venv) $ flask collect-static --clean
+
+# 压测场景的名字，与 watchlist.bench.BENCH_SCENARIOS 的键一致；写在这里是为了不在加载命令时就导入压测代码
+BENCH_SCENARIO_NAMES = ['index', 'index-auth', 'index-page', 'search', 'edit', 'login', 'inject-user']
+
+
+@click.command()
+@click.option('--movies', default=10000, show_default=True, help='Movies seeded into the throwaway database.')
+@click.option('--requests', 'requests_count', default=200, show_default=True, help='Requests per scenario.')
+@click.option('--threads', default=1, show_default=True, help='Concurrent client threads.')
+@click.option('--scenario', 'scenarios', multiple=True, type=click.Choice(BENCH_SCENARIO_NAMES),
+              help='Scenario to run, can be repeated. Runs all scenarios by default.')
+@click.option('--no-page-cache', is_flag=True, help='Disable the rendered page cache.')
+def bench(movies, requests_count, threads, scenarios, no_page_cache):
+    """Benchmark the views against a throwaway database and print JSON."""
+    from watchlist import create_app
+    from watchlist.bench import run_bench_scenario, seed_bench_database
+
+    # 用临时数据库另外创建一个程序实例，不会碰到 data.db
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+            'PAGE_CACHE_ENABLED': not no_page_cache,
+        })
+        with bench_app.app_context():
+            movie_ids = seed_bench_database(movies)
+            results = {name: run_bench_scenario(name, requests_count, threads, movie_ids)
+                       for name in scenarios or BENCH_SCENARIO_NAMES}
+            db.engine.dispose()  # 关闭连接池里的连接，临时目录才能删除
+    click.echo(json.dumps({
+        'movies': movies,
+        'threads': threads,
+        'page_cache': not no_page_cache,
+        'db_profile': bench_app.config['SQLITE_PROFILE'],
+        'scenarios': results,
+    }, indent=2))
+# 压测结果以 JSON 输出，可以保存下来和之后的结果对比：
+# (venv) $ flask bench --movies 100000 --threads 4 --scenario index --scenario login > bench.json
+
+
+@click.command('bench-startup')
+@click.option('--runs', default=5, show_default=True, help='Fresh processes to time.')
+@click.option('--max-ms', type=float, help='Fail if the median create_app() or flask command time exceeds this.')
+def bench_startup(runs, max_ms):
+    """Time importing the app and running a flask command in fresh processes."""
+    from watchlist.bench import measure_startup
+
+    results = measure_startup(runs)
+    click.echo(json.dumps(dict(results, runs=runs), indent=2))
+    slow = [name for name in ('create_app_ms', 'cli_ms') if max_ms is not None and results[name]['median'] > max_ms]
+    if slow:
+        raise click.ClickException(f'Startup is slower than {max_ms:g}ms: {", ".join(slow)}.')
+# 启动耗时检查：worker 启动、每条 flask 命令都要付出这部分开销，可以放进 CI 防止回退：
+# (venv) $ flask bench-startup --runs 10 --max-ms 500
+
+
+def register_commands(app):
+    for command in (initdb, rebuild_stats_command, dedupe, forge, admin, import_movies, export_movies, enrich,
+                    collect_static_command, bench, bench_startup):
+        app.cli.add_command(command)
@@ -0,0 +1,47 @@
+import gzip
+
+from flask import current_app, request
+
+from watchlist.assets import accepts_gzip
+
+# 压缩后的响应和原始响应是同一资源的不同表示，ETag 加上后缀区分，
+# 缓存代理不会把压缩过的内容当成未压缩的版本交给不支持 gzip 的客户端
+GZIP_ETAG_SUFFIX = '-gzip'
+COMPRESS_MIMETYPES = {'text/html', 'text/css', 'text/plain', 'text/csv', 'application/json',
+                      'application/javascript', 'image/svg+xml'}
+
+
+def compress_response(response):
+    """用 gzip 压缩 HTML、JSON 等文本响应
+
+    流式响应（导出）和直接发送文件的响应（静态文件）不处理，预压缩的静态文件由 send_static_asset() 发送。
+    """
+    if response.mimetype not in COMPRESS_MIMETYPES or 'Content-Encoding' in response.headers \
+            or response.is_streamed or response.direct_passthrough:
+        return response
+    response.vary.add('Accept-Encoding')
+    if not accepts_gzip():
+        return response
+    etag, weak = response.get_etag()
+    if response.status_code == 304:
+        # 304 没有响应体，这里不知道完整响应会不会被压缩，按客户端手里的版本回应：
+        # 客户端发来的是压缩版本的 ETag（带后缀），返回的 ETag 也带后缀
+        if etag and request.if_none_match.contains(etag + GZIP_ETAG_SUFFIX):
+            response.set_etag(etag + GZIP_ETAG_SUFFIX, weak)
+        return response
+    if response.calculate_content_length() < current_app.config['GZIP_MIN_SIZE']:
+        return response
+    response.set_data(gzip.compress(response.get_data(), compresslevel=current_app.config['GZIP_COMPRESS_LEVEL']))
+    response.headers['Content-Encoding'] = 'gzip'
+    if etag:
+        response.set_etag(etag + GZIP_ETAG_SUFFIX, weak)
+    return response
+
+
+def init_compression(app):
+    """注册压缩钩子，要在 init_metrics() 之后调用
+
+    after_request 钩子按注册的相反顺序执行，这样压缩先完成，请求监控记录的是实际发送的响应大小。
+    """
+    if app.config['GZIP_ENABLED']:
+        app.after_request(compress_response)
@@ -0,0 +1,82 @@
+import os
+import pathlib
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from watchlist.extensions import db
+
+
+# 各个引擎配置（profile）在每个新连接上执行的 PRAGMA，选择方式见 settings.py
+SQLITE_PROFILES = {
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # 负数表示单位为 KiB，即 64 MiB
+        'temp_store': 'MEMORY',
+    },
+    'readonly': {
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'query_only': 'ON',
+    },
+}
+
+
+def configure_sqlite_engine(app):
+    """根据 SQLITE_PROFILE 设置引擎参数，返回每个新连接需要执行的 PRAGMA"""
+    profile = app.config['SQLITE_PROFILE']
+    if profile not in SQLITE_PROFILES:
+        raise RuntimeError(f'Unknown WATCHLIST_DB_PROFILE: {profile!r}')
+    pragmas = dict(SQLITE_PROFILES[profile])
+    if profile == 'default':
+        return pragmas
+    pragmas['busy_timeout'] = app.config['SQLITE_BUSY_TIMEOUT']
+    if profile == 'readonly':
+        database = os.path.abspath(make_url(app.config['SQLALCHEMY_DATABASE_URI']).database)
+        path = pathlib.Path(database).as_posix().lstrip('/')
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///file:///{path}?mode=ro&uri=true'
+    # SQLAlchemy 1.4 对 SQLite 文件数据库默认不复用连接（NullPool），每次都要重新打开文件、重新执行 PRAGMA
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': QueuePool,
+        'pool_size': app.config['SQLITE_POOL_SIZE'],
+        'max_overflow': app.config['SQLITE_POOL_SIZE'] * 2,
+        'pool_timeout': app.config['SQLITE_BUSY_TIMEOUT'] / 1000,
+        'connect_args': {
+            'check_same_thread': False,  # 连接由连接池管理，会在不同线程中使用
+            'timeout': app.config['SQLITE_BUSY_TIMEOUT'] / 1000,
+        },
+    }
+    return pragmas
+
+
+def init_sqlite_engine(app, pragmas):
+    """在 db.init_app() 创建引擎之后调用：每个新连接建立时执行 PRAGMA，并登记引擎以便 fork 之后丢弃连接"""
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', set_sqlite_pragmas)
+        forked_engines.add(db.engine)
+
+
+# 用 gunicorn --preload 之类预先加载程序再 fork 出 worker 时，父进程连接池里的 SQLite 连接会被子进程继承，
+# 两个进程共用同一个连接会损坏数据。fork 之后在子进程里丢弃这些连接（close=False：不去关闭父进程还在用的连接），
+# 子进程第一次查询时再建立自己的连接。
+forked_engines = weakref.WeakSet()
+
+
+def dispose_engines_after_fork():
+    for engine in list(forked_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):  # Windows 上没有 fork
+    os.register_at_fork(after_in_child=dispose_engines_after_fork)
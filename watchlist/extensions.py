@@ -0,0 +1,21 @@
+from flask_login import LoginManager
+from flask_sqlalchemy import SQLAlchemy
+
+# 扩展对象在这里创建，不绑定程序实例，由 create_app() 调用 init_app() 初始化，
+# 这样同一个进程里可以按不同的配置创建多个程序实例（比如 flask bench 使用的临时数据库）。
+db = SQLAlchemy()
+
+# 使用 Flask-Login 步骤一：创建用户加载回调函数
+login_manager = LoginManager()  # 实例化扩展类
+login_manager.login_view = 'auth.login'  # 未登录时重定向到登录页面
+login_manager.login_message = "Please log in to do this!"    # 自定义错误提示消息
+
+
+@login_manager.user_loader
+def load_user(user_id):  # 创建用户加载回调函数，接受用户 ID 作为参数。当程序运行后，如果用户已登录， current_user 变量的值会是当前用户的用户模型类记录
+    from watchlist.caching import user_cache
+    from watchlist.models import User
+
+    user_id = int(user_id)
+    user = user_cache.get(('id', user_id), lambda: User.query.get(user_id))  # 用 ID 作为 User 模型的主键查询对应的用户
+    return user  # 返回用户对象
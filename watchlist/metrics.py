@@ -0,0 +1,167 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from werkzeug.local import LocalProxy
+
+from watchlist.caching import page_cache, user_cache
+from watchlist.extensions import db
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    """Prometheus 风格的直方图，只记录每个桶的计数、总和与总数"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个是 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def format_labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels) + '}'
+
+
+class RequestMetrics:
+    """按端点汇总的请求指标，每个进程各自统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)  # (endpoint, method, status) -> 次数
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.template_time = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.response_size = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+        self.sql_queries = defaultdict(int)
+        self.sql_time = defaultdict(float)
+
+    def record(self, endpoint, method, status, duration, sql_queries, sql_time, template_time, size):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            self.latency[endpoint].observe(duration)
+            self.sql_queries[endpoint] += sql_queries
+            self.sql_time[endpoint] += sql_time
+            if template_time:
+                self.template_time[endpoint].observe(template_time)
+            if size is not None:
+                self.response_size[endpoint].observe(size)
+
+    def render(self):
+        """输出 Prometheus 文本格式"""
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def histogram(name, help_text, histograms):
+            metric(name, 'histogram', help_text)
+            for endpoint, hist in sorted(histograms.items()):
+                cumulative = 0
+                for bound, count in zip(hist.buckets + ('+Inf',), hist.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{format_labels([("endpoint", endpoint), ("le", bound)])} {cumulative}')
+                lines.append(f'{name}_sum{format_labels([("endpoint", endpoint)])} {hist.sum}')
+                lines.append(f'{name}_count{format_labels([("endpoint", endpoint)])} {hist.count}')
+
+        def counter(name, help_text, values):
+            metric(name, 'counter', help_text)
+            for endpoint, value in sorted(values.items()):
+                lines.append(f'{name}{format_labels([("endpoint", endpoint)])} {value}')
+
+        with self._lock:
+            metric('watchlist_requests_total', 'counter', 'HTTP requests handled.')
+            for (endpoint, method, status), value in sorted(self.requests.items()):
+                labels = format_labels([('endpoint', endpoint), ('method', method), ('status', status)])
+                lines.append(f'watchlist_requests_total{labels} {value}')
+            histogram('watchlist_request_duration_seconds', 'Request latency.', self.latency)
+            counter('watchlist_sql_queries_total', 'SQL statements executed.', self.sql_queries)
+            counter('watchlist_sql_duration_seconds_total', 'Time spent executing SQL.', self.sql_time)
+            histogram('watchlist_template_render_seconds', 'Jinja template render time.', self.template_time)
+            histogram('watchlist_response_size_bytes', 'Response body size.', self.response_size)
+        for name, cache in (('user_cache', user_cache), ('page_cache', page_cache)):
+            stats = cache.stats()
+            metric(f'watchlist_{name}_hits_total', 'counter', f'{name} hits.')
+            lines.append(f'watchlist_{name}_hits_total {stats["hits"]}')
+            metric(f'watchlist_{name}_misses_total', 'counter', f'{name} misses.')
+            lines.append(f'watchlist_{name}_misses_total {stats["misses"]}')
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = LocalProxy(lambda: current_app.extensions['request_metrics'])
+
+
+class TimedTemplate(Template):
+    """记录渲染耗时的模板类，继承的父模板在同一次 render() 中渲染，不会重复计时"""
+
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            if has_request_context() and 'metrics_start' in g:
+                g.template_time += time.perf_counter() - start
+
+
+def start_request_metrics():
+    if current_app.config['METRICS_ENABLED']:
+        g.metrics_start = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_time = 0.0
+        g.template_time = 0.0
+        g.captured_queries = [] if current_app.config['SLOW_REQUEST_THRESHOLD'] else None
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_request_context() and 'metrics_start' in g:
+        g.sql_queries += 1
+        g.sql_time += elapsed
+        if g.captured_queries is not None:
+            g.captured_queries.append((elapsed, statement))
+
+
+def record_request_metrics(response):
+    if 'metrics_start' not in g:
+        return response
+    duration = time.perf_counter() - g.metrics_start
+    endpoint = request.endpoint or 'none'
+    size = None if response.is_streamed else response.calculate_content_length()
+    request_metrics.record(endpoint, request.method, response.status_code, duration,
+                           g.sql_queries, g.sql_time, g.template_time, size)
+    threshold = current_app.config['SLOW_REQUEST_THRESHOLD']
+    if threshold and duration > threshold:
+        queries = '\n'.join(f'  {elapsed * 1000:.2f}ms {statement}' for elapsed, statement in g.captured_queries)
+        current_app.logger.warning('Slow request: %s %s took %.3fs (%d queries, %.3fs SQL, %.3fs templates)\n%s',
+                                   request.method, request.full_path.rstrip('?'), duration, g.sql_queries,
+                                   g.sql_time, g.template_time, queries)
+    return response
+
+
+def init_metrics(app):
+    """注册请求钩子、模板和 SQL 计时，需要在 db.init_app() 之后调用"""
+    app.extensions['request_metrics'] = RequestMetrics()
+    app.jinja_env.template_class = TimedTemplate
+    app.before_request(start_request_metrics)
+    app.after_request(record_request_metrics)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
@@ -0,0 +1,273 @@
+from sqlalchemy import DDL, column, event, table, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import validates
+from flask_login import UserMixin
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from watchlist.extensions import db
+
+
+# 5，定义数据模型
+class User(db.Model, UserMixin):  # 表名将会是 user（自动生成，小写处理）。使用 Flask-Login 步骤二：让 User 模型继承 UserMixin 类，从而让 User 类拥有几个用于判断认证状态的属性和方法，
+    # 如果自定义表名，可以定义 __tablename__ 属性。
+    id = db.Column(db.Integer, primary_key=True)  # 主键
+    name = db.Column(db.String(20))  # 名字
+    username = db.Column(db.String(20), unique=True, index=True)  # 用户名，登录时按它查询，所以建唯一索引
+    password_hash = db.Column(db.String(128))  # 密码散列值
+
+    def set_password(self, password):  # 用来设置密码的方法，接受密码作为参数
+        self.password_hash = generate_password_hash(password)  # 将生成的密码保持到对应字段
+
+    def validate_password(self, password):  # 用于验证密码的方法，接受密码作为参数
+        return check_password_hash(self.password_hash, password)  # 返回布尔值
+# 因为模型（表结构）发生变化，我们需要重新生成数据库（这会清空数据）：flask initdb --drop
+
+
+def make_title_key(title):
+    """标题的规范化形式，用来判断两部电影是否重复：合并空白字符并忽略大小写"""
+    return ' '.join((title or '').split()).casefold()
+
+
+def title_key_default(context):
+    # Core 的 insert（批量导入、API、upsert）没有经过模型，由列的默认值从 title 计算
+    return make_title_key(context.get_current_parameters()['title'])
+
+
+class Movie(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # 主键
+    title = db.Column(db.String(60))  # 电影标题
+    year = db.Column(db.Integer, nullable=False)  # 电影年份，存为整数，排序和范围查询按数值比较
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # 这条电影属于哪个用户的观影清单
+    title_key = db.Column(db.String(60), nullable=False, default=title_key_default)  # 规范化的标题，见 make_title_key()
+    # 以下由 flask enrich 从 IMDb 数据文件中补充，没有匹配到时为空
+    imdb_id = db.Column(db.String(12))  # IMDb 编号，例如 tt0110413
+    runtime = db.Column(db.Integer)  # 片长（分钟）
+    genres = db.Column(db.String(100))  # 类型，逗号分隔，例如 Action,Crime,Drama
+
+    # 为键集分页（keyset pagination）准备的复合索引：在某个用户的清单里按 (year, id) 或 (title, id) 排序并定位游标时，
+    # SQLite 可以直接在索引上做范围扫描，每页的代价与表的大小无关。年份范围过滤和按年代统计也由第一个索引完成。
+    # 两个索引都以 user_id 开头，同时也充当外键 user_id 的索引。
+    __table_args__ = (
+        db.Index('ix_movie_user_year_id', 'user_id', 'year', 'id'),
+        db.Index('ix_movie_user_title_id', 'user_id', 'title', 'id'),
+        # 同一个清单里同一年不能有两部标题相同的电影，写入时用 INSERT ... ON CONFLICT DO NOTHING 跳过重复
+        db.Index('ux_movie_user_title_key_year', 'user_id', 'title_key', 'year', unique=True),
+    )
+
+    @validates('title')
+    def update_title_key(self, key, title):  # 通过模型修改标题时（编辑表单）同步更新规范化的标题
+        self.title_key = make_title_key(title)
+        return title
+
+
+# 插入电影的 upsert 语句：已经存在（同一用户、规范化标题和年份相同）的电影被跳过，
+# 判断重复由唯一索引在插入的同一条语句里完成，不需要先查询一次。结果的 rowcount 是实际插入的行数。
+movie_upsert = sqlite_insert(Movie.__table__).on_conflict_do_nothing(
+    index_elements=['user_id', 'title_key', 'year'])
+
+
+# 标题全文检索：FTS5 外部内容（external content）虚拟表，只保存索引，标题本身仍然存放在 movie 表里。
+# 由触发器在 movie 表插入、修改、删除时增量维护，所以表单、批量导入等所有写入路径都不需要额外处理。
+# user_id 也放进全文索引，查询时用列过滤（user_id : "1"）把结果限定在一个用户的清单里，由索引完成而不是事后过滤。
+MOVIE_FTS_DDL = [
+    DDL("CREATE VIRTUAL TABLE IF NOT EXISTS movie_fts USING fts5("
+        "title, user_id, content='movie', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"),
+    DDL("CREATE TRIGGER IF NOT EXISTS movie_fts_insert AFTER INSERT ON movie BEGIN "
+        "INSERT INTO movie_fts(rowid, title, user_id) VALUES (new.id, new.title, new.user_id); END"),
+    DDL("CREATE TRIGGER IF NOT EXISTS movie_fts_delete AFTER DELETE ON movie BEGIN "
+        "INSERT INTO movie_fts(movie_fts, rowid, title, user_id) VALUES ('delete', old.id, old.title, old.user_id); END"),
+    DDL("CREATE TRIGGER IF NOT EXISTS movie_fts_update AFTER UPDATE OF title, user_id ON movie BEGIN "
+        "INSERT INTO movie_fts(movie_fts, rowid, title, user_id) VALUES ('delete', old.id, old.title, old.user_id); "
+        "INSERT INTO movie_fts(rowid, title, user_id) VALUES (new.id, new.title, new.user_id); END"),
+]
+for ddl in MOVIE_FTS_DDL:
+    event.listen(Movie.__table__, 'after_create', ddl)
+event.listen(Movie.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS movie_fts'))
+
+# 查询时使用的轻量表对象，rank 是 FTS5 按 bm25 计算的相关度（越小越相关）
+movie_fts = table('movie_fts', column('rowid'), column('rank'), column('movie_fts'))
+
+
+class CacheGeneration(db.Model):
+    """页面缓存的版本号（generation）
+
+    每次修改电影数据时，在同一个事务里把版本号加一；页面缓存和 ETag 都以版本号为准，
+    版本号存在数据库里，所以多个 worker 进程看到的是同一个值。
+    """
+    name = db.Column(db.String(20), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class MovieYearStat(db.Model):
+    """统计汇总表：每个用户每一年的电影数量
+
+    由 movie 表上的触发器随每次插入、修改、删除增量维护，统计页面和标题数量直接读取这张小表，
+    而不是每次对整张 movie 表做 GROUP BY。数据不一致时可以用 flask rebuild-stats 重新计算。
+    """
+    user_id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# 触发器：没有所属用户的电影（旧数据库升级遗留）不计入统计
+MOVIE_STAT_DDL = [
+    DDL("CREATE TRIGGER IF NOT EXISTS movie_stat_insert AFTER INSERT ON movie WHEN new.user_id IS NOT NULL BEGIN "
+        "INSERT INTO movie_year_stat (user_id, year, count) VALUES (new.user_id, new.year, 1) "
+        "ON CONFLICT (user_id, year) DO UPDATE SET count = count + 1; END"),
+    DDL("CREATE TRIGGER IF NOT EXISTS movie_stat_delete AFTER DELETE ON movie WHEN old.user_id IS NOT NULL BEGIN "
+        "UPDATE movie_year_stat SET count = count - 1 WHERE user_id = old.user_id AND year = old.year; "
+        "DELETE FROM movie_year_stat WHERE user_id = old.user_id AND year = old.year AND count <= 0; END"),
+    DDL("CREATE TRIGGER IF NOT EXISTS movie_stat_update_old AFTER UPDATE OF year, user_id ON movie "
+        "WHEN old.user_id IS NOT NULL BEGIN "
+        "UPDATE movie_year_stat SET count = count - 1 WHERE user_id = old.user_id AND year = old.year; "
+        "DELETE FROM movie_year_stat WHERE user_id = old.user_id AND year = old.year AND count <= 0; END"),
+    DDL("CREATE TRIGGER IF NOT EXISTS movie_stat_update_new AFTER UPDATE OF year, user_id ON movie "
+        "WHEN new.user_id IS NOT NULL BEGIN "
+        "INSERT INTO movie_year_stat (user_id, year, count) VALUES (new.user_id, new.year, 1) "
+        "ON CONFLICT (user_id, year) DO UPDATE SET count = count + 1; END"),
+]
+for ddl in MOVIE_STAT_DDL:
+    event.listen(Movie.__table__, 'after_create', ddl)
+
+
+def rebuild_stats(connection):
+    """从 movie 表重新计算统计汇总表"""
+    connection.execute(text('DELETE FROM movie_year_stat'))
+    connection.execute(text('INSERT INTO movie_year_stat (user_id, year, count) '
+                            'SELECT user_id, year, count(*) FROM movie WHERE user_id IS NOT NULL '
+                            'GROUP BY user_id, year'))
+
+
+# 6，在数据库中创建所有模型对应的表
+# (venv) $ flask shell
+# >>> from watchlist.extensions import db
+# >>> db.create_all()
+# 然后会在上面指定的地方创建 .db 文件，这个文件就是数据库文件，可以用 SQLite 等工具打开查看，一般不需要提交到版本库中。
+# 如果改动了模型类，想重新生成表模式，需要先使用 db.drop_all() 删除表，然后重新创建。
+# 如果想在不破坏数据库内的数据的前提下变更表的结构，需要使用数据库迁移工具，比如集成了 Alembic 的 Flask-Migrate 扩展。
+# 修改数据模型后，需要重新生成数据库迁移脚本，然后再执行脚本更新数据库。
+# Flask 数据库迁移 flask-migrate： https://cloud.tencent.com/developer/article/1585940
+
+
+# 8，数据库基本的CRUD操作
+# 8.1，创建数据
+# (venv) dfl@WebDev:~/learn/flask/watchlist$ flask shell
+# Python 3.10.6 (main, Aug 10 2022, 11:40:04) [GCC 11.3.0] on linux
+# App: watchlist
+# Instance: /home/dfl/learn/flask/watchlist/instance
+# >>> from watchlist.models import User, Movie
+# >>> user = User(name='xiaolu2333')    # 在实例化模型类的时候，我们并没有传入 id 字段（主键），因为 SQLAlchemy 会自动处理这个字段。
+# >>> m1 = Movie(title='Leon', year='1994')
+# >>> m2 = Movie(title='Mahjong', year='1996')
+# >>> db.session.add(user)  # 把新创建的记录添加到数据库会话
+# >>> db.session.add(m1)
+# >>> db.session.add(m2)
+# >>> db.session.commit()  # 提交数据库会话，只需要在最后调用一次即可
+# 创建数据的时候，我们也可以使用 add_all() 方法一次性添加多个记录，传入的参数是列表。
+# >>> db.session.add_all([m1, m2])
+# >>> db.session.commit()
+# 8.2，查询数据
+# 通过对模型类的 query 属性调用可选的过滤方法和查询方法就可以获取到对应的单个（模型类实例）或多个记录（模型类实例列表）：
+# <模型类>.query.<过滤方法（可选）>.<查询方法>
+# 8.2.1，查询所有记录
+# >>> movies = Movie.query.all()    # 获取所有电影记录
+# >>> type(movies)                  # 返回的是一个列表
+# <class 'list'>
+# >>> type(movies[0])               # 列表中的元素是 Movie 类的实例
+# <class 'watchlist.models.Movie'>
+# >>> Movie.query.count()        # 获取电影记录的数量
+# 2
+# 8,2,2 过滤查询：filter/filter_by/limit/offset/order_by/group_by/having/first/first_or_404/get/get_or_404
+# >>> Movie.query.first()        # 获取第一个电影记录
+# <Movie 1>
+# >>> Movie.query.get(1)         # 获取主键为 1 的电影记录
+# <Movie 1>
+# >>> Movie.query.filter_by(title='Leon').first()  # 获取标题为 Leon 的电影记录
+# <Movie 1>
+# >>> Movie.query.order_by(Movie.title).all()  # 获取所有电影记录，并按照标题进行排序
+# [<Movie 1>, <Movie 2>]
+# >>> Movie.query.order_by(Movie.title.desc()).all()  # 获取所有电影记录，并按照标题进行降序排序
+# [<Movie 2>, <Movie 1>]
+# >>> Movie.query.paginate(page=1, per_page=1).items  # 获取第 1 页，每页 1 条记录
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.title.like('%on%')).all()  # 获取标题中包含 on 的电影记录
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.title.ilike('%ON%')).all()  # 获取标题中包含 on 的电影记录，不区分大小写
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.title.in_(['Leon', 'Mahjong'])).all()  # 获取标题为 Leon 或 Mahjong 的电影记录
+# [<Movie 1>, <Movie 2>]
+# >>> Movie.query.filter(Movie.title.notin_(['Leon', 'Mahjong'])).all()  # 获取标题不为 Leon 或 Mahjong 的电影记录
+# []
+# >>> Movie.query.filter(Movie.title.is_('Leon')).all()  # 获取标题为 Leon 的电影记录
+# []
+# >>> Movie.query.filter(Movie.title.isnot('Leon')).all()  # 获取标题不为 Leon 的电影记录
+# [<Movie 1>, <Movie 2>]
+# >>> Movie.query.filter(Movie.title == 'Leon').all()  # 获取标题为 Leon 的电影记录
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.title != 'Leon').all()  # 获取标题不为 Leon 的电影记录
+# [<Movie 2>]
+# >>> Movie.query.filter(Movie.title > 'Leon').all()  # 获取标题大于 Leon 的电影记录
+# [<Movie 2>]
+# >>> Movie.query.filter(Movie.title >= 'Leon').all()  # 获取标题大于等于 Leon 的电影记录
+# [<Movie 1>, <Movie 2>]
+# >>> Movie.query.filter(Movie.title < 'Leon').all()  # 获取标题小于 Leon 的电影记录
+# []
+# >>> Movie.query.filter(Movie.title <= 'Leon').all()  # 获取标题小于等于 Leon 的电影记录
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.title != 'Leon').filter(Movie.year == '1996').all()  # 获取标题不为 Leon 并且年份为 1996 的电影记录
+# [<Movie 2>]
+# >>> Movie.query.filter(Movie.title != 'Leon', Movie.year == '1996').all()  # 获取标题不为 Leon 并且年份为 1996 的电影记录
+# [<Movie 2>]
+# >>> Movie.query.filter(or_(Movie.title == 'Leon', Movie.title == 'Mahjong')).all()  # 获取标题为 Leon 或 Mahjong 的电影记录
+# [<Movie 1>, <Movie 2>]
+# >>> Movie.query.filter(and_(Movie.title == 'Leon', Movie.year == '1996')).all()  # 获取标题为 Leon 并且年份为 1996 的电影记录
+# [<Movie 1>]
+# >>> Movie.query.first_or_404(Movie.title == 'Leon')  # 获取标题为 Leon 的电影记录，如果不存在则返回 404 错误
+# <Movie 1>
+# >>> Movie.query.get_or_404(1)  # 获取主键为 1 的电影记录，如果不存在则返回 404 错误
+# <Movie 1>
+# >>> Movie.query.filter(Movie.title == 'Leon').first_or_404()  # 获取标题为 Leon 的电影记录，如果不存在则返回 404 错误
+# <Movie 1>
+# >>> Movie.query.filter(Movie.title == 'Leon').one_or_none()  # 获取标题为 Leon 的电影记录，如果不存在则返回 None
+# <Movie 1>
+# >>> Movie.query.filter(Movie.title == 'Leon').one()  # 获取标题为 Leon 的电影记录，如果不存在或者存在多条记录则抛出异常
+# <Movie 1>
+# >>> Movie.query.filter(Movie.title == 'Leon').count()  # 获取标题为 Leon 的电影记录的数量
+# 1
+# >>> Movie.query.filter(Movie.title == 'Leon').exists()  # 判断标题为 Leon 的电影记录是否存在
+# True
+# >>> Movie.query.filter(Movie.title == 'Leon').limit(1).all()  # 获取标题为 Leon 的电影记录的前 1 条记录
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.title == 'Leon').offset(1).all()  # 获取标题为 Leon 的电影记录的第 2 条记录
+# []
+# >>> Movie.query.filter(Movie.title == 'Leon').order_by(Movie.year).all()  # 获取标题为 Leon 的电影记录并按照年份升序排序
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.title == 'Leon').order_by(Movie.year.desc()).all()  # 获取标题为 Leon 的电影记录并按照年份降序排序
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.title == 'Leon').order_by(Movie.year.asc()).all()  # 获取标题为 Leon 的电影记录并按照年份升序排序
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.title == 'Leon').order_by(Movie.year.desc()).order_by(Movie.title).all()  # 获取标题为 Leon 的电影记录并按照年份降序排序，如果年份相同则按照标题升序排序
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.title == 'Leon').order_by(Movie.year.desc(), Movie.title).all()  # 获取标题为 Leon 的电影记录并按照年份降序排序，如果年份相同则按照标题升序排序
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.title == 'Leon').order_by(Movie.year.desc(), Movie.title.desc()).all()  # 获取标题为 Leon 的电影记录并按照年份降序排序，如果年份相同则按照标题降序排序
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.year > '1996', Movie.year < '2000').all()    # 获取年份大于 1996 并且小于 2000 的电影记录
+# [<Movie 1>]
+# >>> Movie.query.filter(Movie.year.between('1996', '2000')).all()    # 获取年份在 1996 到 2000 之间的电影记录
+# [<Movie 1>]
+# 8.3 更新记录
+# >>> movie = Movie.query.get(1)  # 获取主键为 1 的电影记录
+# >>> movie.title = 'Leon: The Professional'  # 修改标题
+# >>> movie.year = '1994'  # 修改年份
+# >>> db.session.commit()  # 提交会话
+# >>> # 统一将标题包含 Leon 的电影记录的标题修改为 Leon: The Professional
+# >>> Movie.query.filter(Movie.title.like('%Leon%')).update({'title': 'Leon: The Professional'})
+# 1
+# >>> db.session.commit()  # 提交会话
+# 8.4 删除记录
+# >>> movie = Movie.query.get(1)  # 获取主键为 1 的电影记录
+# >>> db.session.delete(movie)  # 删除电影记录
+# >>> db.session.commit()  # 提交会话
+# >>> Movie.query.filter(Movie.title.like('%Leon%')).delete()   # 删除所有标题包含 Leon 的电影记录
+# Flask-SQLAlchemy：https://flask-sqlalchemy.palletsprojects.com/en/2.x/
@@ -0,0 +1,229 @@
+import base64
+import csv
+import io
+import json
+from collections import namedtuple
+
+from flask import current_app, request
+from sqlalchemy import func, select, tuple_
+
+from watchlist.caching import owner_id
+from watchlist.extensions import db
+from watchlist.models import Movie, MovieYearStat, movie_fts
+
+
+def clean_movie(title, year):
+    """校验电影的标题和年份，合法时返回 (title, year)，year 转换为整数，否则返回 None
+
+    创建、编辑表单和批量导入共用这一套规则：标题不为空且不超过 60 个字符，年份为 4 位数字。
+    """
+    if not title or not year or len(year) != 4 or not year.isdigit() or len(title) > 60:
+        return None
+    return title, int(year)
+
+
+# 导出格式及对应的 MIME 类型
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def iter_export(fmt, user_id, chunk_size=1000):
+    """按块读取一个用户的电影并逐块生成 CSV / JSONL 文本
+
+    使用 yield_per 分批从游标取数据，内存占用只和 chunk_size 有关，与表的大小无关。
+    """
+    stmt = select(Movie.id, Movie.title, Movie.year).where(Movie.user_id == user_id).order_by(Movie.id)
+    stmt = stmt.execution_options(yield_per=chunk_size)
+    result = db.session.execute(stmt)
+    if fmt == 'csv':
+        yield 'id,title,year\n'
+    for rows in result.partitions():
+        buffer = io.StringIO()
+        if fmt == 'csv':
+            csv.writer(buffer, lineterminator='\n').writerows(rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(row._mapping), ensure_ascii=False) + '\n')
+        yield buffer.getvalue()
+
+
+# 键集分页（keyset pagination）：不使用 OFFSET，而是记住上一页最后一条记录的排序键 (key, id)，
+# 下一页直接从索引中该位置之后开始读取，所以翻到第几页、表里有多少行，每页的代价都一样。
+MOVIE_SORT_COLUMNS = {
+    'year': Movie.year,
+    'title': Movie.title,
+}
+
+MOVIE_SEARCH_SORT_COLUMNS = dict(MOVIE_SORT_COLUMNS, rank=movie_fts.c.rank)
+
+MoviePage = namedtuple('MoviePage', ['items', 'next_cursor', 'prev_cursor'])
+
+
+def encode_cursor(value, movie_id):
+    """把排序键编码为可以放进查询字符串的游标"""
+    raw = json.dumps([value, movie_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，格式不对时返回 None（当作从头开始）"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, movie_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    # 排序键只能是字符串或数字（bool 是 int 的子类，要单独排除），列表、对象等传给 SQLite 会出错
+    if not isinstance(movie_id, int) or isinstance(movie_id, bool):
+        return None
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+        return None
+    return value, movie_id
+
+
+def paginate_movies(query, sort='year', order='asc', per_page=20, after=None, before=None):
+    """对电影查询做键集分页，after/before 分别是向后、向前翻页的游标"""
+    sort_column = MOVIE_SEARCH_SORT_COLUMNS[sort]
+    query = query.add_columns(sort_column)  # 同时取出排序键，用来生成游标
+    key = tuple_(sort_column, Movie.id)
+    # 只有 before 游标能正确解析时才向前翻页，无效的游标当作从头开始向后翻页
+    cursor = decode_cursor(before) if before and not after else None
+    backwards = cursor is not None
+    if not backwards:
+        cursor = decode_cursor(after)
+    # 向前翻页时按相反方向扫描索引，取到结果后再反转回来
+    ascending = (order == 'desc') == backwards
+    if cursor is not None:
+        bound = tuple_(*cursor)
+        query = query.filter(key > bound if ascending else key < bound)
+    if ascending:
+        query = query.order_by(sort_column.asc(), Movie.id.asc())
+    else:
+        query = query.order_by(sort_column.desc(), Movie.id.desc())
+    rows = query.limit(per_page + 1).all()  # 多取一条，用来判断后面还有没有数据
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def cursor_of(row):
+        movie, sort_key = row
+        return encode_cursor(sort_key, movie.id)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if backwards:
+            next_cursor = cursor_of(rows[-1])
+            prev_cursor = cursor_of(rows[0]) if has_more else None
+        else:
+            next_cursor = cursor_of(rows[-1]) if has_more else None
+            prev_cursor = cursor_of(rows[0]) if cursor is not None else None
+    return MoviePage([movie for movie, _ in rows], next_cursor, prev_cursor)
+
+
+def build_search_query(q):
+    """把用户输入转换为 FTS5 查询语句
+
+    每个词都加上引号按词匹配（避免用户输入被当成 FTS5 语法），以 * 结尾的词按前缀匹配，
+    多个词之间是 AND 关系。没有有效的词时返回空字符串。
+    """
+    terms = []
+    for token in q.split():
+        prefix = token.endswith('*')
+        token = token.rstrip('*').replace('"', '""')
+        if token:
+            terms.append(f'"{token}"*' if prefix else f'"{token}"')
+    return ' '.join(terms)
+
+
+def user_search_match(match, user_id):
+    """把 build_search_query() 的结果限定在 user_id 的清单中，返回 MATCH 条件"""
+    match = f'user_id : "{user_id}" AND title : ({match})'
+    return movie_fts.c.movie_fts.op('MATCH')(match)
+
+
+def search_movies(query, match, user_id):
+    """在电影查询上加上全文检索条件，只在 user_id 的清单中查找，match 为 build_search_query() 的结果
+
+    查询要由全文索引驱动：先用 MATCH 找出命中的行，再按 rowid 读取 movie。如果 movie.user_id 上有可以走索引的条件，
+    SQLite 会改成按 (user_id, ...) 索引扫描用户的整个清单，对每一行执行一次 MATCH，几十万行的清单一次搜索要十几秒。
+    用户范围已经由 MATCH 里的 user_id 列限定，movie 一侧的条件写成 user_id + 0，不会被当成索引条件。
+    """
+    return query.join(movie_fts, movie_fts.c.rowid == Movie.id) \
+        .filter(user_search_match(match, user_id), Movie.user_id + 0 == user_id)
+
+
+def count_search_results(match, user_id):
+    """搜索结果的总数，只读全文索引，不回表"""
+    return db.session.execute(select(func.count()).select_from(movie_fts)
+                              .where(user_search_match(match, user_id))).scalar()
+
+
+def query_movie_list():
+    """根据查询字符串（q、year_from、year_to、decade、sort、order、per_page、after、before）查询当前这一页电影
+
+    HTML 列表页和 JSON API 共用这一套参数。
+    """
+    # 只查询当前这一页，而不是 Movie.query.all() 把整张表读进内存。
+    q = request.args.get('q', '').strip()
+    match = build_search_query(q)
+    # 搜索时可以按相关度排序，并且默认按相关度排序
+    sort_columns = MOVIE_SEARCH_SORT_COLUMNS if match else MOVIE_SORT_COLUMNS
+    sort = request.args.get('sort', 'rank' if match else 'year')
+    if sort not in sort_columns:
+        sort = 'year'
+    order = 'desc' if request.args.get('order') == 'desc' else 'asc'
+    per_page = request.args.get('per_page', current_app.config['MOVIES_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['MOVIES_MAX_PER_PAGE']))
+    # 年份范围，decade=1990 表示 1990-1999，和 year_from/year_to 同时给出时取交集
+    year_from = request.args.get('year_from', type=int)
+    year_to = request.args.get('year_to', type=int)
+    decade = request.args.get('decade', type=int)
+    if decade is not None:
+        decade -= decade % 10
+        year_from = max(year_from, decade) if year_from is not None else decade
+        year_to = min(year_to, decade + 9) if year_to is not None else decade + 9
+    user_id = owner_id()
+    if match:
+        query = search_movies(Movie.query, match, user_id)
+    else:
+        query = Movie.query.filter(Movie.user_id == user_id)
+    if year_from is not None:
+        query = query.filter(Movie.year >= year_from)
+    if year_to is not None:
+        query = query.filter(Movie.year <= year_to)
+    result_count = None
+    if match:
+        if year_from is None and year_to is None:
+            result_count = count_search_results(match, user_id)
+        else:  # 有年份条件时要回表才能过滤，连接的顺序仍然由全文索引驱动
+            result_count = query.with_entities(func.count(Movie.id)).scalar()
+    page = paginate_movies(query, sort, order, per_page,
+                           after=request.args.get('after'), before=request.args.get('before'))
+    # 翻页、排序链接需要带上的过滤参数，值为 None 的参数 url_for() 会忽略
+    filters = dict(q=q if match else None, decade=decade,
+                   year_from=request.args.get('year_from', type=int), year_to=request.args.get('year_to', type=int))
+    return dict(page=page, result_count=result_count, q=filters['q'], filters=filters, sort_keys=list(sort_columns),
+                sort=sort, order=order, per_page=per_page)
+
+
+def year_counts(user_id):
+    """一个用户清单中每一年的电影数量，返回 [(year, count)]，读取的是统计汇总表"""
+    return db.session.query(MovieYearStat.year, MovieYearStat.count) \
+        .filter(MovieYearStat.user_id == user_id).order_by(MovieYearStat.year).all()
+
+
+def decade_facets(user_id):
+    """按年代统计一个用户清单中的电影数量，返回 [(decade, count)]"""
+    decade = (MovieYearStat.year / 10 * 10).label('decade')
+    return db.session.query(decade, func.sum(MovieYearStat.count)).filter(MovieYearStat.user_id == user_id) \
+        .group_by(decade).order_by(decade).all()
+
+
+def movie_total(user_id):
+    """一个用户清单中的电影总数，只需要读取汇总表中该用户的几十行，与电影数量无关"""
+    return db.session.query(func.coalesce(func.sum(MovieYearStat.count), 0)) \
+        .filter(MovieYearStat.user_id == user_id).scalar()
@@ -0,0 +1,43 @@
+# 默认配置，create_app() 用 app.config.from_object() 读入。
+# 需要从环境变量读取的配置在 create_app() 里设置，可以用 create_app(test_config) 覆盖任意一项。
+
+# 关闭对模型修改的监控
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# 数据库引擎配置（profile），通过环境变量 WATCHLIST_DB_PROFILE 选择：
+#   default     SQLite 默认设置，适合开发。
+#   production  多 worker 部署使用。WAL 日志模式让读不再被写阻塞，synchronous=NORMAL 在 WAL 下仍然不会损坏数据库，
+#               busy_timeout 让写入者排队等待而不是立刻报 "database is locked"，再加上内存映射、更大的页缓存和连接池。
+#   readonly    只读进程（比如只提供浏览和导出的 worker）使用。以 mode=ro 打开数据库并设置 query_only，
+#               数据库需要先用 production 模式打开过一次（切换到 WAL），这样只读连接不会和写入者互相阻塞。
+SQLITE_PROFILE = 'default'
+SQLITE_POOL_SIZE = 5
+SQLITE_BUSY_TIMEOUT = 5000  # 毫秒
+
+# 设置签名所需的密钥，用于保护表单免受跨站请求伪造（Cross-site Request Forgery）的攻击。
+SECRET_KEY = 'dev'  # 等同于 app.secret_key = 'dev'
+# 这个密钥的值在开发时可以随便设置。
+# 基于安全的考虑，在部署时应该设置为随机字符，且不应该明文写在代码里，在部署章节会详细介绍。
+
+# 电影列表分页：默认每页条数，以及通过 ?per_page= 能请求的最大条数
+MOVIES_PER_PAGE = 20
+MOVIES_MAX_PER_PAGE = 100
+# 进程内用户缓存的有效期（秒）。本进程内的修改会立即失效缓存，
+# 这个有效期只是为了让其他进程（比如另一个 worker 或 flask admin 命令）的修改最终也能生效。
+USER_CACHE_TTL = 300
+# 整页缓存：电影列表页渲染结果的缓存条数，设为 False 可以关闭
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_SIZE = 256
+# JSON API 一次批量请求最多包含的操作条数
+API_MAX_BATCH_SIZE = 1000
+# 请求监控：/metrics 以 Prometheus 文本格式输出各个端点的延迟、SQL、模板渲染和响应大小。
+# 设置环境变量 WATCHLIST_SLOW_REQUEST_SECONDS 后，超过该耗时的请求会连同执行过的 SQL 一起写进日志。
+METRICS_ENABLED = True
+SLOW_REQUEST_THRESHOLD = None
+# 静态文件指纹：执行 flask collect-static 后，url_for('static', ...) 输出带内容哈希的文件名，
+# 浏览器可以永久缓存这些文件。构建目录（默认是项目根目录下的 build/static）不提交到仓库，部署时生成。
+STATIC_FINGERPRINT = True
+# HTML、JSON 等文本响应用 gzip 压缩，小于 GZIP_MIN_SIZE 字节的响应压缩不划算，不处理
+GZIP_ENABLED = True
+GZIP_MIN_SIZE = 500
+GZIP_COMPRESS_LEVEL = 6
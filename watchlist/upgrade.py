@@ -0,0 +1,96 @@
+"""把旧版本的数据库升级到当前的表结构，只有 flask initdb 和 flask dedupe 会用到"""
+import click
+from sqlalchemy import func, select, text
+
+from watchlist.caching import bump_generation
+from watchlist.extensions import db
+from watchlist.models import MOVIE_FTS_DDL, MOVIE_STAT_DDL, Movie, User, make_title_key, rebuild_stats
+
+
+def upgrade_database():
+    """把旧版本的数据库升级到当前的表结构，可以重复执行
+
+    create_all() 只会创建不存在的表，已有表的新增列、索引和全文索引需要在这里补上。
+    """
+    with db.engine.begin() as connection:
+        movie_columns = {row[1] for row in connection.execute(text('PRAGMA table_info(movie)'))}
+        if 'user_id' not in movie_columns:  # 单用户版本的数据库：原有的电影都归第一个用户
+            connection.execute(text('ALTER TABLE movie ADD COLUMN user_id INTEGER REFERENCES user (id)'))
+            connection.execute(text('UPDATE movie SET user_id = (SELECT min(id) FROM user)'))
+        for name in ('ix_movie_year_id', 'ix_movie_title_id'):  # 被以 user_id 开头的索引取代
+            connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        if 'title_key' not in movie_columns:  # 在 SQL 里调用 Python 的 make_title_key()，一条 UPDATE 填好已有的数据
+            connection.execute(text("ALTER TABLE movie ADD COLUMN title_key VARCHAR(60) NOT NULL DEFAULT ''"))
+            connection.connection.create_function('make_title_key', 1, make_title_key, deterministic=True)
+            connection.execute(text('UPDATE movie SET title_key = make_title_key(title)'))
+        for name in ('imdb_id', 'runtime', 'genres'):  # 可以为空的新列直接添加
+            if name not in movie_columns:
+                column_type = Movie.__table__.c[name].type.compile(dialect=connection.dialect)
+                connection.execute(text(f'ALTER TABLE movie ADD COLUMN {name} {column_type}'))
+        year_type = next(row[2] for row in connection.execute(text('PRAGMA table_info(movie)')) if row[1] == 'year')
+        if year_type.upper() != 'INTEGER':  # 旧版本的 year 是 VARCHAR(4)
+            rebuild_movie_table(connection)
+        fts_columns = [row[1] for row in connection.execute(text('PRAGMA table_info(movie_fts)'))]
+        if fts_columns != ['title', 'user_id']:  # 没有全文索引，或者是旧的结构，重新建立
+            for name in ('movie_fts_insert', 'movie_fts_delete', 'movie_fts_update'):
+                connection.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+            connection.execute(text('DROP TABLE IF EXISTS movie_fts'))
+            for ddl in MOVIE_FTS_DDL:
+                connection.execute(ddl)
+            connection.execute(text("INSERT INTO movie_fts(movie_fts) VALUES ('rebuild')"))
+        for ddl in MOVIE_STAT_DDL:
+            connection.execute(ddl)
+        # 统计汇总表是刚创建的（还是空的），用已有的数据计算一次
+        if connection.execute(text('SELECT NOT EXISTS (SELECT 1 FROM movie_year_stat) '
+                                   'AND EXISTS (SELECT 1 FROM movie)')).scalar():
+            rebuild_stats(connection)
+    # 所有插入都依赖唯一索引（ON CONFLICT），旧数据里的重复必须先删掉，否则升级后连添加电影都会出错
+    removed = remove_duplicate_movies()
+    db.session.commit()
+    if removed:
+        click.echo(f'Removed {removed} duplicate movies, keeping the oldest of each.', err=True)
+    for index in list(Movie.__table__.indexes) + list(User.__table__.indexes):
+        index.create(db.engine, checkfirst=True)
+
+
+def remove_duplicate_movies():
+    """删除重复的电影（同一用户、规范化标题和年份相同），每组只保留 id 最小的一条，返回删除的条数
+
+    一条 DELETE 完成，全文索引和统计汇总表由触发器同步更新；受影响用户的缓存版本号一起加一，由调用方提交。
+    """
+    kept = select(func.min(Movie.id)).where(Movie.user_id.isnot(None)) \
+        .group_by(Movie.user_id, Movie.title_key, Movie.year)
+    duplicate = (Movie.user_id.isnot(None), Movie.id.notin_(kept))
+    user_ids = db.session.execute(select(Movie.user_id).where(*duplicate).distinct()).scalars().all()
+    if not user_ids:
+        return 0
+    result = db.session.execute(Movie.__table__.delete().where(*duplicate))
+    for user_id in user_ids:
+        bump_generation(user_id)
+    return result.rowcount
+
+
+def rebuild_movie_table(connection):
+    """按当前模型重建 movie 表，用于修改列类型（SQLite 不支持 ALTER COLUMN）
+
+    做法是 SQLite 文档推荐的：旧表改名，建新表，复制数据，删除旧表。年份转换为整数，不是 4 位数字的记为 0。
+    """
+    # 索引和触发器的名字在整个数据库中唯一，先删掉才能在新表上重建
+    for kind, name in connection.execute(text("SELECT type, name FROM sqlite_master WHERE type IN ('index', 'trigger') "
+                                              "AND tbl_name = 'movie' AND sql IS NOT NULL")).all():
+        connection.execute(text(f'DROP {kind.upper()} {name}'))
+    connection.execute(text('ALTER TABLE movie RENAME TO movie_old'))
+    Movie.__table__.create(connection)  # 同时建好索引和触发器
+    # 旧数据里可能有重复的电影，唯一索引留到 upgrade_database() 的最后检查过重复之后再建
+    connection.execute(text('DROP INDEX ux_movie_user_title_key_year'))
+    old_columns = {row[1] for row in connection.execute(text('PRAGMA table_info(movie_old)'))}
+    columns = [name for name in Movie.__table__.columns.keys() if name in old_columns]
+    # CAST 会转换开头的数字（'19x' 变成 19），所以先用 GLOB 检查是不是 4 位数字，与 clean_movie() 的规则一致
+    year = "CASE WHEN trim(year) GLOB '[0-9][0-9][0-9][0-9]' THEN CAST(trim(year) AS INTEGER) ELSE 0 END"
+    values = [year if name == 'year' else name for name in columns]
+    connection.execute(text(f'INSERT INTO movie ({", ".join(columns)}) '
+                            f'SELECT {", ".join(values)} FROM movie_old'))
+    connection.execute(text('DROP TABLE movie_old'))
+    # 复制数据时触发器又写入了一遍，重新计算
+    connection.execute(text("INSERT INTO movie_fts(movie_fts) VALUES ('rebuild')"))
+    rebuild_stats(connection)